@@ -1,26 +1,70 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+from urllib.parse import urlsplit
+import json
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Tuple
 import uuid
-from datetime import datetime, timedelta
+import asyncio
+import bisect
+import re
+import time
+from collections import OrderedDict, deque
+import contextvars
+import random
+import sys
+import threading
+import hmac
+import gzip
+import zlib
+from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 import jwt
 from email_validator import validate_email, EmailNotValidError
 import bcrypt
+from pymongo import ReturnDocument, ReplaceOne, UpdateOne, DeleteOne, monitoring
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request profiling (see SamplingProfiler); set while a profiled request runs
+current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+class ProfileCommandListener(monitoring.CommandListener):
+    # Motor runs pymongo on executor threads with the caller's context copied,
+    # so current_profile identifies the request that issued the command.
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    @staticmethod
+    def _record(event):
+        profile = current_profile.get()
+        if profile is not None:
+            profile.mongo_durations.append(event.duration_micros / 1_000_000)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[ProfileCommandListener()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -36,6 +80,65 @@ SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Background jobs (set JOB_WORKERS=0 when running worker.py as a separate process)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE_SECONDS = float(os.environ.get("JOB_BACKOFF_BASE_SECONDS", "2"))
+JOB_BACKOFF_MAX_SECONDS = float(os.environ.get("JOB_BACKOFF_MAX_SECONDS", "300"))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_SECONDS", "1"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 3
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Batch reads
+MAX_BATCH_PRODUCT_IDS = 100
+MAX_BATCH_SUBREQUESTS = 20
+
+# Type-ahead suggestions
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_SCAN_LIMIT = 500
+SEARCH_TERM_MAX_LENGTH = 50
+SUGGEST_MIN_SEARCH_COUNT = int(os.environ.get("SUGGEST_MIN_SEARCH_COUNT", "3"))
+SEARCH_TERM_MAX_TRACKED = int(os.environ.get("SEARCH_TERM_MAX_TRACKED", "10000"))
+SEARCH_TERM_FLUSH_SECONDS = float(os.environ.get("SEARCH_TERM_FLUSH_SECONDS", "30"))
+SEARCH_TERM_RETENTION_DAYS = 30
+
+# Archival of unavailable products (ARCHIVE_SWEEP_INTERVAL_SECONDS=0 disables the sweeper)
+ARCHIVE_SWEEP_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_SWEEP_INTERVAL_SECONDS", "300"))
+ARCHIVE_AFTER_HOURS = float(os.environ.get("ARCHIVE_AFTER_HOURS", "24"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "200"))
+ARCHIVE_BATCH_PAUSE_SECONDS = float(os.environ.get("ARCHIVE_BATCH_PAUSE_SECONDS", "0.5"))
+
+# Catalog listing cache
+LISTING_CACHE_TTL_SECONDS = float(os.environ.get("LISTING_CACHE_TTL_SECONDS", "30"))
+LISTING_CACHE_STALE_SECONDS = float(os.environ.get("LISTING_CACHE_STALE_SECONDS", "120"))
+LISTING_CACHE_MAX_ENTRIES = int(os.environ.get("LISTING_CACHE_MAX_ENTRIES", "500"))
+
+# Request profiling
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.005"))
+PROFILE_LOOP_LAG_THRESHOLD_SECONDS = float(os.environ.get("PROFILE_LOOP_LAG_THRESHOLD_SECONDS", "0.01"))
+PROFILE_OUTPUT_DIR = Path(os.environ.get("PROFILE_OUTPUT_DIR", str(ROOT_DIR / "profiles")))
+PROFILE_HISTORY_SIZE = 50
+PROFILE_HEADER_SECRET = os.environ.get("PROFILE_HEADER_SECRET", "")
+
+# Response compression
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "500"))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+# Maximum levels only for static payloads built once at import; cache fills
+# use the fast levels above so a miss doesn't add ~150 ms of brotli per page
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "application/javascript", "application/xml", "image/svg+xml", "text/")
+
+# Sales rollups
+ROLLUP_GRANULARITIES = ("hour", "day")
+ROLLUP_DIMENSIONS = ("total", "category", "donor")
+ROLLUP_BACKFILL_BATCH_SIZE = 500
+ROLLUP_QUERY_LIMIT = 5000
+ROLLUP_BACKFILL_LOCK_ID = "sales_rollups"
+
 # Models
 class UserCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=100)
@@ -108,6 +211,19 @@ class Cart(BaseModel):
     items: List[CartItem]
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ProfilingConfig(BaseModel):
+    enabled: bool = False
+    routes: List[str] = []  # path prefixes, e.g. "/api/cart"
+    sample_rate: float = Field(default=0.0, ge=0.0, le=1.0)
+    allow_header: bool = False  # profile requests sent with "X-Profile: <PROFILE_HEADER_SECRET>"
+
+class BatchSubRequest(BaseModel):
+    method: str = Field(default="GET", pattern="^GET$")
+    path: str = Field(..., pattern="^/api/")
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=MAX_BATCH_SUBREQUESTS)
+
 # Utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -140,6 +256,1057 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="User not found")
     return User(**user)
 
+async def attach_donor_names(products: List[Dict[str, Any]]):
+    # One $in lookup for all donors instead of a find_one per product
+    donor_ids = list({product["donor_id"] for product in products})
+    if not donor_ids:
+        return
+    donors = await db.users.find({"id": {"$in": donor_ids}}, {"id": 1, "name": 1}).to_list(None)
+    donor_names = {donor["id"]: donor["name"] for donor in donors}
+    for product in products:
+        if product["donor_id"] in donor_names:
+            product["donor_name"] = donor_names[product["donor_id"]]
+
+# Background jobs
+# Jobs live in db.jobs so they survive restarts; any process running
+# run_job_worker() (in-process at startup or worker.py) can claim them.
+job_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+job_metrics: Dict[str, int] = {
+    "enqueued": 0,
+    "deduplicated": 0,
+    "succeeded": 0,
+    "retried": 0,
+    "failed": 0,
+}
+job_worker_tasks: List[asyncio.Task] = []
+
+def job_handler(job_type: str):
+    def decorator(func):
+        job_handlers[job_type] = func
+        return func
+    return decorator
+
+def job_backoff_seconds(attempts: int) -> float:
+    return min(JOB_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), JOB_BACKOFF_MAX_SECONDS)
+
+async def enqueue_job(job_type: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> str:
+    now = datetime.utcnow()
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": JOB_MAX_ATTEMPTS,
+        "run_at": now,
+        "locked_until": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    if idempotency_key is None:
+        await db.jobs.insert_one(job)
+        job_metrics["enqueued"] += 1
+        return job["id"]
+
+    # Same key => same job, so retried requests never queue duplicate side effects.
+    # The upsert copies idempotency_key from the filter into the new document.
+    try:
+        result = await db.jobs.update_one(
+            {"idempotency_key": idempotency_key}, {"$setOnInsert": job}, upsert=True
+        )
+        if result.upserted_id is not None:
+            job_metrics["enqueued"] += 1
+            return job["id"]
+    except DuplicateKeyError:
+        pass
+    job_metrics["deduplicated"] += 1
+    existing = await db.jobs.find_one({"idempotency_key": idempotency_key})
+    return existing["id"]
+
+async def claim_job(worker_id: str) -> Optional[Dict[str, Any]]:
+    now = datetime.utcnow()
+    # Running jobs whose lease expired belong to a crashed worker and are picked
+    # up again, unless that crash used their last attempt
+    return await db.jobs.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {
+                    "status": "running",
+                    "locked_until": {"$lt": now},
+                    "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+                },
+            ]
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def fail_abandoned_jobs():
+    # Lease expired on the last attempt: the worker died mid-run, give up
+    now = datetime.utcnow()
+    result = await db.jobs.update_many(
+        {
+            "status": "running",
+            "locked_until": {"$lt": now},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+        },
+        {"$set": {"status": "failed", "locked_until": None, "last_error": "Lease expired", "updated_at": now}},
+    )
+    job_metrics["failed"] += result.modified_count
+
+async def renew_job_lease(job: Dict[str, Any]):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        now = datetime.utcnow()
+        result = await db.jobs.update_one(
+            {"id": job["id"], "worker_id": job["worker_id"], "status": "running"},
+            {"$set": {"locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now}},
+        )
+        if not result.matched_count:
+            logger.warning(f"Job {job['id']} ({job['type']}) lost its lease")
+            return
+
+async def finish_job(job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+    # Only the worker still holding the lease may record the outcome
+    result = await db.jobs.update_one(
+        {"id": job["id"], "worker_id": job["worker_id"], "status": "running"},
+        {"$set": update},
+    )
+    return result.matched_count > 0
+
+async def run_job(job: Dict[str, Any]):
+    handler = job_handlers.get(job["type"])
+    heartbeat = asyncio.create_task(renew_job_lease(job))
+    try:
+        if handler is None:
+            raise RuntimeError(f"No handler registered for job type '{job['type']}'")
+        await handler(job["payload"])
+    except Exception as e:
+        now = datetime.utcnow()
+        if handler is None or job["attempts"] >= job["max_attempts"]:
+            job_metrics["failed"] += 1
+            logger.error(f"Job {job['id']} ({job['type']}) failed permanently: {e}")
+            update = {"status": "failed", "locked_until": None, "last_error": str(e), "updated_at": now}
+        else:
+            job_metrics["retried"] += 1
+            delay = job_backoff_seconds(job["attempts"])
+            logger.warning(f"Job {job['id']} ({job['type']}) failed, retrying in {delay}s: {e}")
+            update = {
+                "status": "queued",
+                "run_at": now + timedelta(seconds=delay),
+                "locked_until": None,
+                "last_error": str(e),
+                "updated_at": now,
+            }
+        await finish_job(job, update)
+        return
+    finally:
+        heartbeat.cancel()
+
+    job_metrics["succeeded"] += 1
+    now = datetime.utcnow()
+    await finish_job(
+        job, {"status": "done", "locked_until": None, "completed_at": now, "updated_at": now}
+    )
+
+async def run_job_worker(worker_id: str):
+    logger.info(f"Job worker {worker_id} started")
+    while True:
+        try:
+            job = await claim_job(worker_id)
+            if job is None:
+                await fail_abandoned_jobs()
+                await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+                continue
+            await run_job(job)
+        except asyncio.CancelledError:
+            logger.info(f"Job worker {worker_id} stopped")
+            raise
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} error: {e}")
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+
+def start_job_workers(count: int):
+    for i in range(count):
+        worker_id = f"{os.getpid()}-{i}"
+        job_worker_tasks.append(asyncio.create_task(run_job_worker(worker_id)))
+
+async def stop_job_workers():
+    for task in job_worker_tasks:
+        task.cancel()
+    await asyncio.gather(*job_worker_tasks, return_exceptions=True)
+    job_worker_tasks.clear()
+
+# Product archive
+# Unavailable products are moved from db.products to db.products_archive so the
+# hot collection and its indexes only hold live inventory.
+archive_sweeper_task: Optional[asyncio.Task] = None
+
+async def find_product_including_archive(product_id: str):
+    product = await db.products.find_one({"id": product_id})
+    if product:
+        return db.products, product
+    product = await db.products_archive.find_one({"id": product_id})
+    if product:
+        return db.products_archive, product
+    return None, None
+
+async def find_products_including_archive(product_ids: List[str]) -> List[Dict[str, Any]]:
+    products = await db.products.find({"id": {"$in": product_ids}}).to_list(None)
+    missing_ids = list(set(product_ids) - {product["id"] for product in products})
+    if missing_ids:
+        products += await db.products_archive.find({"id": {"$in": missing_ids}}).to_list(None)
+    return products
+
+async def archive_unavailable_products(after_hours: float = ARCHIVE_AFTER_HOURS) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=after_hours)
+    query = {
+        "is_available": False,
+        "$or": [{"unavailable_at": {"$lte": cutoff}}, {"unavailable_at": {"$exists": False}}],
+    }
+    archived = 0
+    while True:
+        batch = await db.products.find(query).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+        if not batch:
+            break
+        
+        # Copy first, then delete: a crash in between only leaves a duplicate
+        # that the next sweep overwrites.
+        now = datetime.utcnow()
+        for product in batch:
+            product["archived_at"] = now
+        await db.products_archive.bulk_write(
+            [ReplaceOne({"id": product["id"]}, product, upsert=True) for product in batch],
+            ordered=False,
+        )
+        # Only delete the exact versions that were copied. A product edited
+        # since the read keeps its live document, and the stale archive copy
+        # is dropped; a later sweep archives the new version if it qualifies.
+        result = await db.products.bulk_write(
+            [
+                DeleteOne({"id": product["id"], "is_available": False, "updated_at": product.get("updated_at")})
+                for product in batch
+            ],
+            ordered=False,
+        )
+        archived += result.deleted_count
+        if result.deleted_count < len(batch):
+            product_ids = [product["id"] for product in batch]
+            still_live = await db.products.distinct("id", {"id": {"$in": product_ids}})
+            await db.products_archive.delete_many({"id": {"$in": still_live}})
+        
+        if len(batch) < ARCHIVE_BATCH_SIZE:
+            break
+        # Throttle so large backlogs don't starve live traffic
+        await asyncio.sleep(ARCHIVE_BATCH_PAUSE_SECONDS)
+    return archived
+
+async def run_archive_sweeper():
+    while True:
+        try:
+            archived = await archive_unavailable_products()
+            if archived:
+                logger.info(f"Archived {archived} unavailable products")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Archive sweep error: {e}")
+        await asyncio.sleep(ARCHIVE_SWEEP_INTERVAL_SECONDS)
+
+def start_archive_sweeper():
+    global archive_sweeper_task
+    if ARCHIVE_SWEEP_INTERVAL_SECONDS > 0:
+        archive_sweeper_task = asyncio.create_task(run_archive_sweeper())
+
+async def stop_archive_sweeper():
+    global archive_sweeper_task
+    if archive_sweeper_task:
+        archive_sweeper_task.cancel()
+        await asyncio.gather(archive_sweeper_task, return_exceptions=True)
+        archive_sweeper_task = None
+
+# Sales rollups
+# db.sales_rollups holds one document per (granularity, bucket, dimension, key)
+# with order count, revenue and items sold, so dashboard ranges read a few
+# hundred small documents instead of scanning db.orders.
+def to_naive_utc(value: datetime) -> datetime:
+    # Orders store naive UTC datetimes; query params may arrive with an offset
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def rollup_bucket(created_at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return created_at.replace(minute=0, second=0, microsecond=0)
+    return created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def add_order_to_rollups(
+    increments: Dict[tuple, Dict[str, float]],
+    order: Dict[str, Any],
+    products_by_id: Dict[str, Dict[str, Any]],
+):
+    per_key: Dict[Tuple[str, str], Dict[str, float]] = {
+        ("total", "all"): {
+            "orders": 1,
+            "revenue": order["total_amount"],
+            "items_sold": sum(item["quantity"] for item in order["items"]),
+        }
+    }
+    for item in order["items"]:
+        if "unit_price" in item:
+            unit_price, category, donor_id = item["unit_price"], item["category"], item["donor_id"]
+        else:
+            # Orders placed before items carried a price snapshot
+            product = products_by_id.get(item["product_id"])
+            if not product:
+                continue
+            unit_price, category, donor_id = product["price"], product["category"], product["donor_id"]
+        for dimension, key in (("category", category), ("donor", donor_id)):
+            counters = per_key.setdefault((dimension, key), {"orders": 1, "revenue": 0.0, "items_sold": 0})
+            counters["revenue"] += unit_price * item["quantity"]
+            counters["items_sold"] += item["quantity"]
+    
+    for granularity in ROLLUP_GRANULARITIES:
+        bucket = rollup_bucket(order["created_at"], granularity)
+        for (dimension, key), counters in per_key.items():
+            totals = increments.setdefault(
+                (granularity, bucket, dimension, key), {"orders": 0, "revenue": 0.0, "items_sold": 0}
+            )
+            for name, value in counters.items():
+                totals[name] += value
+
+async def compute_rollup_increments(orders: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, float]]:
+    product_ids = list({
+        item["product_id"] for order in orders for item in order["items"] if "unit_price" not in item
+    })
+    products_by_id: Dict[str, Dict[str, Any]] = {}
+    if product_ids:
+        # Sold items may already have been archived
+        products = await find_products_including_archive(product_ids)
+        products_by_id = {product["id"]: product for product in products}
+    
+    increments: Dict[tuple, Dict[str, float]] = {}
+    for order in orders:
+        add_order_to_rollups(increments, order, products_by_id)
+    return increments
+
+def rollup_filter(bucket_key: tuple) -> Dict[str, Any]:
+    granularity, bucket, dimension, key = bucket_key
+    return {"granularity": granularity, "bucket": bucket, "dimension": dimension, "key": key}
+
+async def apply_rollup_increments(increments: Dict[tuple, Dict[str, float]]):
+    if not increments:
+        return
+    operations = [
+        UpdateOne(rollup_filter(bucket_key), {"$inc": counters}, upsert=True)
+        for bucket_key, counters in increments.items()
+    ]
+    await db.sales_rollups.bulk_write(operations, ordered=False)
+
+async def apply_order_rollups(order_id: str, increments: Dict[tuple, Dict[str, float]]):
+    # Each bucket records the order id in the same write as its $inc, so a
+    # retry after a partial failure skips the buckets already counted
+    if not increments:
+        return
+    try:
+        await db.sales_rollups.bulk_write([
+            UpdateOne(
+                rollup_filter(bucket_key),
+                {"$setOnInsert": {"orders": 0, "revenue": 0.0, "items_sold": 0}},
+                upsert=True,
+            )
+            for bucket_key in increments
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Duplicate keys only mean a concurrent upsert created the bucket first
+        if e.details.get("writeConcernErrors") or any(
+            error["code"] != 11000 for error in e.details["writeErrors"]
+        ):
+            raise
+    await db.sales_rollups.bulk_write([
+        UpdateOne(
+            {**rollup_filter(bucket_key), "applied_orders": {"$ne": order_id}},
+            {"$inc": counters, "$addToSet": {"applied_orders": order_id}},
+        )
+        for bucket_key, counters in increments.items()
+    ], ordered=False)
+
+async def release_order_rollups(order_id: str, increments: Dict[tuple, Dict[str, float]]):
+    # Once the order is marked rolled_up the buckets no longer need its id
+    if not increments:
+        return
+    await db.sales_rollups.bulk_write([
+        UpdateOne(rollup_filter(bucket_key), {"$pull": {"applied_orders": order_id}})
+        for bucket_key in increments
+    ], ordered=False)
+
+async def acquire_backfill_lock(backfill_id: str, start: datetime, end: datetime) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db.rollup_backfills.update_one(
+            {"_id": ROLLUP_BACKFILL_LOCK_ID, "expires_at": {"$lte": now}},
+            {"$set": {
+                "backfill_id": backfill_id,
+                "start": start,
+                "end": end,
+                "expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            }},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # Another backfill holds the lock
+    return True
+
+async def renew_backfill_lock(backfill_id: str):
+    # Expires on its own if the job dies; the job's retry acquires it again
+    renewed = await db.rollup_backfills.update_one(
+        {"_id": ROLLUP_BACKFILL_LOCK_ID, "backfill_id": backfill_id},
+        {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)}},
+    )
+    if not renewed.matched_count:
+        raise RuntimeError("Rollup backfill lock expired")
+
+# Response compression
+def supported_encodings() -> List[str]:
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> str:
+    # Highest q-value wins; ties keep the order of `available` (br before gzip)
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name] = weight
+    
+    best, best_weight = "identity", 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+class StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Flush every chunk so streamed responses reach the client as they are produced
+        if self.encoding == "br":
+            return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+# Wraps an ASGI send: buffers up to minimum_size, then compresses chunk by chunk;
+# responses that already carry a Content-Encoding pass straight through
+class CompressingSender:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self._start: Optional[Dict[str, Any]] = None
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._compressor: Optional[StreamCompressor] = None
+        self._passthrough = False
+
+    async def send(self, message):
+        if self._passthrough:
+            await self._send(message)
+            return
+        
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+                self._passthrough = True
+                await self._send(message)
+                return
+            self._start = message
+            return
+        
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self._compressor is not None:
+            body = self._compressor.compress(body, final=not more_body)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+        
+        self._buffer.append(body)
+        self._buffered += len(body)
+        if more_body and self._buffered < self.minimum_size:
+            return
+        body = b"".join(self._buffer)
+        self._buffer = []
+        
+        if not more_body and len(body) < self.minimum_size:
+            self._passthrough = True
+            await self._send(self._start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+        
+        self._compressor = StreamCompressor(self.encoding)
+        body = self._compressor.compress(body, final=not more_body)
+        headers = MutableHeaders(scope=self._start)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+        await self._send(self._start)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = negotiate_encoding(accept_encoding, supported_encodings())
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+        
+        sender = CompressingSender(send, encoding, self.minimum_size)
+        await self.app(scope, receive, sender.send)
+
+# JSON body stored with its gzip/brotli encodings, built once per cache fill
+class PrecompressedPayload:
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+    ):
+        self.media_type = media_type
+        self.item_count: Optional[int] = None
+        self.encodings: Dict[str, bytes] = {"identity": body}
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            self.encodings["gzip"] = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+            if brotli:
+                self.encodings["br"] = brotli.compress(body, quality=brotli_quality)
+
+    @classmethod
+    def from_content(cls, content: Any, **compression) -> "PrecompressedPayload":
+        # Same encoding FastAPI's default JSONResponse uses
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        payload = cls(body, **compression)
+        if isinstance(content, list):
+            payload.item_count = len(content)
+        return payload
+
+    def response(self, request: Request) -> Response:
+        available = [encoding for encoding in supported_encodings() if encoding in self.encodings]
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), available)
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.encodings[encoding], media_type=self.media_type, headers=headers)
+
+# Catalog listing cache
+# Single-flight, stale-while-revalidate cache for get_products; entries are tagged
+# with their category filter (None for "All") so writes only drop affected listings
+class ListingCache:
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[tuple, Tuple[Optional[str], asyncio.Task]] = {}
+        self._generation = 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    async def get(self, key: tuple, category: Optional[str], loader: Callable[[], Awaitable[Any]]):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and now < entry["stale_until"]:
+            self._entries.move_to_end(key)
+            if now < entry["fresh_until"]:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._load(key, category, loader)
+            return entry["value"]
+        
+        if key in self._inflight:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        # Shield so one cancelled client doesn't cancel the query for everyone waiting
+        return await asyncio.shield(self._load(key, category, loader))
+
+    def _load(self, key: tuple, category: Optional[str], loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        if key in self._inflight:
+            return self._inflight[key][1]
+        task = asyncio.create_task(self._run_load(key, category, loader))
+        task.add_done_callback(self._log_load_failure)
+        self._inflight[key] = (category, task)
+        return task
+
+    async def _run_load(self, key: tuple, category: Optional[str], loader: Callable[[], Awaitable[Any]]):
+        generation = self._generation
+        try:
+            value = await loader()
+        finally:
+            if self._inflight.get(key, (None, None))[1] is asyncio.current_task():
+                del self._inflight[key]
+        
+        # A product write during the query may have made this result outdated
+        if generation == self._generation:
+            now = time.monotonic()
+            self._entries[key] = {
+                "value": value,
+                "category": category,
+                "fresh_until": now + self.ttl,
+                "stale_until": now + self.ttl + self.stale_ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _log_load_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Listing cache load failed: {task.exception()}")
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def invalidate(self, categories: List[str]):
+        self.stats["invalidations"] += 1
+        self._generation += 1
+        
+        def affected(category: Optional[str]) -> bool:
+            return category is None or category in categories
+        
+        for key in [key for key, entry in self._entries.items() if affected(entry["category"])]:
+            del self._entries[key]
+        # Later requests must not join a query that started before the write
+        for key in [key for key, (category, _) in self._inflight.items() if affected(category)]:
+            del self._inflight[key]
+
+listing_cache = ListingCache(LISTING_CACHE_TTL_SECONDS, LISTING_CACHE_STALE_SECONDS, LISTING_CACHE_MAX_ENTRIES)
+
+# Request profiling
+class RequestProfile:
+    def __init__(self, method: str, path: str, root_frame):
+        self.id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.root_frame = root_frame
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.active_seconds = 0.0  # wall time sampled with the request on the loop
+        self.cpu_seconds = 0.0  # loop-thread CPU time over those samples
+        self.mongo_durations: List[float] = []
+        self.max_loop_lag = 0.0
+        self.loop_blocked = 0.0
+
+# Samples the loop thread's stack from a background thread and attributes samples
+# to the request whose middleware frame is on it; Mongo time comes from ProfileCommandListener
+class SamplingProfiler:
+    def __init__(self):
+        self.config = ProfilingConfig()
+        self.history: deque = deque(maxlen=PROFILE_HISTORY_SIZE)
+        self._active: List[RequestProfile] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._loop_cpu_clock: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._probe_pending = False
+        self._probe_posted_at = 0.0
+
+    def should_profile(self, scope) -> bool:
+        config = self.config
+        if not config.enabled:
+            return False
+        if config.allow_header and PROFILE_HEADER_SECRET:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, PROFILE_HEADER_SECRET.encode())
+        if any(scope["path"].startswith(route) for route in config.routes):
+            return True
+        return config.sample_rate > 0 and random.random() < config.sample_rate
+
+    def start(self, scope, root_frame) -> RequestProfile:
+        profile = RequestProfile(scope["method"], scope["path"], root_frame)
+        self._loop = asyncio.get_running_loop()
+        if self._loop_thread_id is None:
+            self._loop_thread_id = threading.get_ident()
+            # Per-thread CPU clock of the loop thread, readable from the sampler (Unix only)
+            if hasattr(time, "pthread_getcpuclockid"):
+                self._loop_cpu_clock = time.pthread_getcpuclockid(self._loop_thread_id)
+        self._active.append(profile)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+        return profile
+
+    async def finish(self, profile: RequestProfile, status_code: Optional[int]):
+        # A request that blocked the loop and finished without yielding never
+        # sees the pending probe run; account for the lag up to now
+        if self._probe_pending:
+            self._record_lag(profile, self._probe_posted_at, time.perf_counter())
+        self._active.remove(profile)
+        wall = time.perf_counter() - profile.started
+        summary = {
+            "id": profile.id,
+            "method": profile.method,
+            "path": profile.path,
+            "status": status_code,
+            "started_at": profile.started_at,
+            "wall_ms": round(wall * 1000, 3),
+            "loop_active_ms": round(profile.active_seconds * 1000, 3),
+            "python_cpu_ms": round(profile.cpu_seconds * 1000, 3) if self._loop_cpu_clock is not None else None,
+            "mongo_ms": round(sum(profile.mongo_durations) * 1000, 3),
+            "mongo_commands": len(profile.mongo_durations),
+            "loop_blocked_ms": round(profile.loop_blocked * 1000, 3),
+            "max_loop_lag_ms": round(profile.max_loop_lag * 1000, 3),
+            "samples": profile.samples,
+            "file": str(PROFILE_OUTPUT_DIR / f"{profile.id}.folded"),
+        }
+        try:
+            await asyncio.to_thread(self._write_profile, profile)
+        except OSError as e:
+            logger.error(f"Could not write profile {profile.id}: {e}")
+            summary["file"] = None
+        if len(self.history) == self.history.maxlen:
+            # The oldest summary is about to be dropped; its file goes with it
+            evicted = self.history[-1]
+            if evicted["file"]:
+                await asyncio.to_thread(Path(evicted["file"]).unlink, missing_ok=True)
+        self.history.appendleft(summary)
+        logger.info(
+            f"Profiled {profile.method} {profile.path}: {summary['wall_ms']}ms wall, "
+            f"{summary['python_cpu_ms']}ms python cpu, {summary['mongo_ms']}ms mongo"
+        )
+
+    @staticmethod
+    def _write_profile(profile: RequestProfile):
+        PROFILE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        lines = [f"{stack} {count}\n" for stack, count in profile.stacks.items()]
+        (PROFILE_OUTPUT_DIR / f"{profile.id}.folded").write_text("".join(lines))
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+    def _loop_cpu_time(self) -> float:
+        if self._loop_cpu_clock is None:
+            return 0.0
+        return time.clock_gettime(self._loop_cpu_clock)
+
+    def _sample_loop(self):
+        last_sample = time.perf_counter()
+        last_cpu = self._loop_cpu_time()
+        while True:
+            if not self._active:
+                # Sleep until the next profiled request instead of polling
+                self._wakeup.wait()
+                self._wakeup.clear()
+                last_sample = time.perf_counter()
+                last_cpu = self._loop_cpu_time()
+                continue
+            
+            # Weight each sample by the time since the last one; the GIL can
+            # delay this thread well past the nominal interval. Wall time
+            # includes GIL waits and blocking calls, the thread CPU clock doesn't.
+            now = time.perf_counter()
+            elapsed = now - last_sample
+            last_sample = now
+            cpu_now = self._loop_cpu_time()
+            cpu_elapsed = cpu_now - last_cpu
+            last_cpu = cpu_now
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame)
+                frame = frame.f_back
+            for profile in list(self._active):
+                for depth, stack_frame in enumerate(stack):
+                    if stack_frame is profile.root_frame:
+                        key = ";".join(self._frame_name(f) for f in reversed(stack[:depth + 1]))
+                        profile.stacks[key] = profile.stacks.get(key, 0) + 1
+                        profile.samples += 1
+                        profile.active_seconds += elapsed
+                        profile.cpu_seconds += cpu_elapsed
+                        break
+            del stack, frame
+            
+            if not self._probe_pending and self._loop is not None:
+                self._probe_pending = True
+                self._probe_posted_at = time.perf_counter()
+                try:
+                    self._loop.call_soon_threadsafe(self._probe_done, self._probe_posted_at)
+                except RuntimeError:
+                    self._probe_pending = False
+            time.sleep(PROFILE_SAMPLE_INTERVAL_SECONDS)
+
+    def _probe_done(self, posted_at: float):
+        now = time.perf_counter()
+        self._probe_pending = False
+        for profile in self._active:
+            self._record_lag(profile, posted_at, now)
+
+    @staticmethod
+    def _record_lag(profile: RequestProfile, posted_at: float, now: float):
+        # Only the part of the lag that overlaps the request counts against it
+        lag = now - max(posted_at, profile.started)
+        profile.max_loop_lag = max(profile.max_loop_lag, lag)
+        if lag > PROFILE_LOOP_LAG_THRESHOLD_SECONDS:
+            profile.loop_blocked += lag
+
+profiler = SamplingProfiler()
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = None
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        profile = profiler.start(scope, sys._getframe())
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_profile.reset(token)
+            await profiler.finish(profile, status_code)
+
+# Type-ahead suggestions
+def normalize_suggest_text(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+# In-memory prefix index. Suggestions are stored under every word suffix so "bik"
+# matches "kids bike"; large prefix ranges are ranked from a cached top-k list.
+class SuggestIndex:
+    def __init__(self):
+        self._keys: List[Tuple[str, str, str]] = []  # (key, kind, text), sorted
+        self._weights: Dict[Tuple[str, str], int] = {}
+        self._products: Dict[str, Tuple[str, int, str]] = {}  # id -> (title, weight, category)
+        self._top: Dict[str, List[Tuple[Tuple[str, str], int]]] = {}  # prefix -> ranked matches
+
+    @staticmethod
+    def _index_keys(text: str) -> List[str]:
+        words = normalize_suggest_text(text).split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _adjust(self, kind: str, text: str, delta: int):
+        ident = (kind, text)
+        old_weight = self._weights.get(ident, 0)
+        new_weight = old_weight + delta
+        if self._top and delta:
+            self._update_top(ident, self._index_keys(text), max(new_weight, 0), delta < 0)
+        if new_weight > 0:
+            self._weights[ident] = new_weight
+            if old_weight <= 0:
+                for key in self._index_keys(text):
+                    bisect.insort(self._keys, (key, kind, text))
+        elif old_weight > 0:
+            del self._weights[ident]
+            for key in self._index_keys(text):
+                i = bisect.bisect_left(self._keys, (key, kind, text))
+                if i < len(self._keys) and self._keys[i] == (key, kind, text):
+                    del self._keys[i]
+
+    @staticmethod
+    def _rank(matches: Dict[Tuple[str, str], int], limit: int) -> List[Tuple[Tuple[str, str], int]]:
+        return sorted(matches.items(), key=lambda match: (-match[1], match[0][1]))[:limit]
+
+    def _update_top(self, ident: Tuple[str, str], keys: List[str], new_weight: int, decreased: bool):
+        for prefix in list(self._top):
+            if not any(key.startswith(prefix) for key in keys):
+                continue
+            top = dict(self._top[prefix])
+            if decreased:
+                # Something outside the list may now outrank this entry
+                if ident in top:
+                    del self._top[prefix]
+                continue
+            top[ident] = new_weight
+            self._top[prefix] = self._rank(top, SUGGEST_MAX_LIMIT)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",))
+        return start, end
+
+    def _rank_range(self, start: int, end: int, limit: int) -> List[Tuple[Tuple[str, str], int]]:
+        matches = {(kind, text): self._weights[(kind, text)] for _, kind, text in self._keys[start:end]}
+        return self._rank(matches, limit)
+
+    def add_product(self, product: Dict[str, Any]):
+        self.remove_product(product["id"])
+        weight = 1 + product.get("reviews_count", 0)
+        self._products[product["id"]] = (product["title"], weight, product["category"])
+        self._adjust("product", product["title"], weight)
+        self._adjust("category", product["category"], 1)
+
+    def remove_product(self, product_id: str):
+        entry = self._products.pop(product_id, None)
+        if entry:
+            title, weight, category = entry
+            self._adjust("product", title, -weight)
+            self._adjust("category", category, -1)
+
+    def add_search_term(self, term: str, count: int = 1):
+        self._adjust("search", term, count)
+
+    def clear(self):
+        self._keys.clear()
+        self._weights.clear()
+        self._products.clear()
+        self._top.clear()
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, str]]:
+        prefix = normalize_suggest_text(prefix)
+        if not prefix:
+            return []
+        
+        start, end = self._range(prefix)
+        if end - start <= SUGGEST_SCAN_LIMIT:
+            ranked = self._rank_range(start, end, limit)
+        else:
+            if prefix not in self._top:
+                self._top[prefix] = self._rank_range(start, end, SUGGEST_MAX_LIMIT)
+            ranked = self._top[prefix][:limit]
+        return [{"text": text, "type": kind} for (kind, text), _ in ranked]
+
+suggest_index = SuggestIndex()
+
+# Search popularity. Counts live in memory (capped at SEARCH_TERM_MAX_TRACKED)
+# and are flushed to db.search_terms in batches; a term is only suggested once
+# SUGGEST_MIN_SEARCH_COUNT searches for it have matched products.
+search_term_counts: Dict[str, int] = {}
+pending_search_terms: Dict[str, int] = {}
+search_term_flush_task: Optional[asyncio.Task] = None
+
+async def build_suggest_index():
+    suggest_index.clear()
+    search_term_counts.clear()
+    products = db.products.find(
+        {"is_available": True}, {"id": 1, "title": 1, "category": 1, "reviews_count": 1}
+    )
+    async for product in products:
+        suggest_index.add_product(product)
+    search_terms = db.search_terms.find({}).sort("count", -1).limit(SEARCH_TERM_MAX_TRACKED)
+    async for search_term in search_terms:
+        search_term_counts[search_term["term"]] = search_term["count"]
+        if search_term["count"] >= SUGGEST_MIN_SEARCH_COUNT:
+            suggest_index.add_search_term(search_term["term"], search_term["count"])
+
+def record_search_term(search: str):
+    term = normalize_suggest_text(search)
+    if not term or len(term) > SEARCH_TERM_MAX_LENGTH:
+        return
+    if term not in search_term_counts and len(search_term_counts) >= SEARCH_TERM_MAX_TRACKED:
+        return
+    
+    count = search_term_counts.get(term, 0) + 1
+    search_term_counts[term] = count
+    pending_search_terms[term] = pending_search_terms.get(term, 0) + 1
+    if count == SUGGEST_MIN_SEARCH_COUNT:
+        suggest_index.add_search_term(term, count)
+    elif count > SUGGEST_MIN_SEARCH_COUNT:
+        suggest_index.add_search_term(term)
+
+async def flush_search_terms():
+    if not pending_search_terms:
+        return
+    batch = dict(pending_search_terms)
+    pending_search_terms.clear()
+    now = datetime.utcnow()
+    try:
+        await db.search_terms.bulk_write(
+            [
+                UpdateOne({"term": term}, {"$inc": {"count": count}, "$set": {"updated_at": now}}, upsert=True)
+                for term, count in batch.items()
+            ],
+            ordered=False,
+        )
+    except Exception:
+        for term, count in batch.items():
+            pending_search_terms[term] = pending_search_terms.get(term, 0) + count
+        raise
+    
+    # When the table is full, forget the long tail that never became suggestions
+    if len(search_term_counts) >= SEARCH_TERM_MAX_TRACKED:
+        for term, count in list(search_term_counts.items()):
+            if count < SUGGEST_MIN_SEARCH_COUNT and term not in pending_search_terms:
+                del search_term_counts[term]
+
+async def run_search_term_flusher():
+    while True:
+        await asyncio.sleep(SEARCH_TERM_FLUSH_SECONDS)
+        try:
+            await flush_search_terms()
+        except Exception as e:
+            logger.error(f"Search term flush error: {e}")
+
+def start_search_term_flusher():
+    global search_term_flush_task
+    search_term_flush_task = asyncio.create_task(run_search_term_flusher())
+
+async def stop_search_term_flusher():
+    global search_term_flush_task
+    if search_term_flush_task:
+        search_term_flush_task.cancel()
+        await asyncio.gather(search_term_flush_task, return_exceptions=True)
+        search_term_flush_task = None
+    try:
+        await flush_search_terms()
+    except Exception as e:
+        logger.error(f"Search term flush error: {e}")
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -216,6 +1383,7 @@ async def login(user_credentials: UserLogin):
 # Product routes
 @api_router.get("/products", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -224,9 +1392,36 @@ async def get_products(
     limit: int = 50,
     skip: int = 0
 ):
+    if not category or category == "All":
+        category = None
+    search = search.strip() if search else None
+    
+    cache_key = (category, search, min_price, max_price, condition, limit, skip)
+    payload = await listing_cache.get(cache_key, category, lambda: query_products_payload(*cache_key))
+    
+    # Only searches that found something count towards suggestions
+    if search and payload.item_count:
+        record_search_term(search)
+    
+    return payload.response(request)
+
+async def query_products_payload(*filters) -> PrecompressedPayload:
+    products = await query_products(*filters)
+    # Serialize and compress off the event loop
+    return await asyncio.to_thread(PrecompressedPayload.from_content, products)
+
+async def query_products(
+    category: Optional[str],
+    search: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    condition: Optional[str],
+    limit: int,
+    skip: int
+) -> List[Product]:
     query = {"is_available": True}
     
-    if category and category != "All":
+    if category:
         query["category"] = category
     
     if search:
@@ -250,13 +1445,29 @@ async def get_products(
     products = await db.products.find(query).skip(skip).limit(limit).to_list(limit)
     
     # Add donor names
-    for product in products:
-        donor = await db.users.find_one({"id": product["donor_id"]})
-        if donor:
-            product["donor_name"] = donor["name"]
+    await attach_donor_names(products)
     
     return [Product(**product) for product in products]
 
+@api_router.get("/products/batch", response_model=List[Product])
+async def get_products_batch(ids: str):
+    product_ids = list(dict.fromkeys(product_id for product_id in ids.split(",") if product_id))
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="At least one product id is required")
+    if len(product_ids) > MAX_BATCH_PRODUCT_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PRODUCT_IDS} product ids per batch")
+    
+    products = await db.products.find(
+        {"id": {"$in": product_ids}, "is_available": True}
+    ).to_list(len(product_ids))
+    
+    # Add donor names
+    await attach_donor_names(products)
+    
+    # Keep the caller's ordering; unknown or unavailable ids are simply omitted
+    by_id = {product["id"]: product for product in products}
+    return [Product(**by_id[product_id]) for product_id in product_ids if product_id in by_id]
+
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     product = await db.products.find_one({"id": product_id, "is_available": True})
@@ -281,6 +1492,8 @@ async def create_product(product_data: ProductCreate, current_user: User = Depen
     
     product = Product(**product_dict)
     await db.products.insert_one(product.dict())
+    suggest_index.add_product(product.dict())
+    listing_cache.invalidate([product.category])
     
     return product
 
@@ -290,7 +1503,7 @@ async def update_product(
     product_data: ProductCreate, 
     current_user: User = Depends(get_current_user)
 ):
-    product = await db.products.find_one({"id": product_id})
+    collection, product = await find_product_including_archive(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
@@ -299,24 +1512,51 @@ async def update_product(
     
     updated_data = product_data.dict()
     updated_data["donor_id"] = product["donor_id"]  # Keep original donor
+    updated_data["updated_at"] = datetime.utcnow()  # Lets the archive sweeper detect edits
     
-    await db.products.update_one({"id": product_id}, {"$set": updated_data})
+    updated_product = await collection.find_one_and_update(
+        {"id": product_id}, {"$set": updated_data}, return_document=ReturnDocument.AFTER
+    )
+    if updated_product is None and collection is db.products:
+        # The archive sweeper moved it since we looked it up
+        updated_product = await db.products_archive.find_one_and_update(
+            {"id": product_id}, {"$set": updated_data}, return_document=ReturnDocument.AFTER
+        )
+    if updated_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
     
-    updated_product = await db.products.find_one({"id": product_id})
+    if updated_product["is_available"]:
+        suggest_index.add_product(updated_product)
+    else:
+        suggest_index.remove_product(product_id)
+    listing_cache.invalidate([product["category"], updated_product["category"]])
     return Product(**updated_product)
 
 @api_router.delete("/products/{product_id}")
 async def delete_product(product_id: str, current_user: User = Depends(get_current_user)):
-    product = await db.products.find_one({"id": product_id})
+    collection, product = await find_product_including_archive(product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if current_user.role != "admin" and product["donor_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this product")
     
-    await db.products.update_one({"id": product_id}, {"$set": {"is_available": False}})
+    # Archived products are already unavailable; the sweeper moves this one later
+    if product["is_available"]:
+        await collection.update_one(
+            {"id": product_id},
+            {"$set": {"is_available": False, "unavailable_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+        )
+        listing_cache.invalidate([product["category"]])
+    suggest_index.remove_product(product_id)
     return {"message": "Product deleted successfully"}
 
+@api_router.get("/suggest")
+async def suggest(q: str, limit: int = SUGGEST_DEFAULT_LIMIT):
+    # Served entirely from memory; never touches Mongo
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+    return {"query": q, "suggestions": suggest_index.suggest(q, limit)}
+
 # Cart routes
 @api_router.get("/cart", response_model=Dict[str, Any])
 async def get_cart(current_user: User = Depends(get_current_user)):
@@ -399,6 +1639,10 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
         if not product:
             raise HTTPException(status_code=404, detail=f"Product {item['product_id']} not found")
         total_amount += product["price"] * item["quantity"]
+        # Snapshot what was charged so later product edits don't rewrite history
+        item["unit_price"] = product["price"]
+        item["category"] = product["category"]
+        item["donor_id"] = product["donor_id"]
     
     order_dict = order_data.dict()
     order_dict["user_id"] = current_user.id
@@ -407,11 +1651,140 @@ async def create_order(order_data: OrderCreate, current_user: User = Depends(get
     order = Order(**order_dict)
     await db.orders.insert_one(order.dict())
     
-    # Clear cart after successful order
-    await db.carts.delete_one({"user_id": current_user.id})
+    # Cart cleanup and any other post-order side effects run in the background
+    await enqueue_job(
+        "order.created",
+        {"order_id": order.id, "user_id": current_user.id},
+        idempotency_key=f"order.created:{order.id}",
+    )
+    await enqueue_job(
+        "order.rollup",
+        {"order_id": order.id},
+        idempotency_key=f"order.rollup:{order.id}",
+    )
     
     return order
 
+@job_handler("order.created")
+async def handle_order_created(payload: Dict[str, Any]):
+    order = await db.orders.find_one({"id": payload["order_id"]})
+    if not order:
+        return
+    
+    # Only pull the ordered products so items added after checkout survive
+    ordered_ids = [item["product_id"] for item in order["items"]]
+    await db.carts.update_one(
+        {"user_id": payload["user_id"]},
+        {"$pull": {"items": {"product_id": {"$in": ordered_ids}}}, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+@job_handler("order.rollup")
+async def handle_order_rollup(payload: Dict[str, Any]):
+    order = await db.orders.find_one({"id": payload["order_id"]})
+    if not order or order.get("rolled_up"):
+        return
+    if await rollup_backfill_covers(order["created_at"]):
+        return  # The running backfill counts this order and sets rolled_up
+    
+    increments = await compute_rollup_increments([order])
+    await apply_order_rollups(order["id"], increments)
+    await db.orders.update_one({"id": order["id"]}, {"$set": {"rolled_up": True}})
+    await release_order_rollups(order["id"], increments)
+
+async def rollup_backfill_covers(created_at: datetime) -> bool:
+    backfill = await db.rollup_backfills.find_one({
+        "_id": ROLLUP_BACKFILL_LOCK_ID,
+        "start": {"$lte": created_at},
+        "end": {"$gt": created_at},
+        "expires_at": {"$gt": datetime.utcnow()},
+    })
+    return backfill is not None
+
+def in_backfill_range(granularity: str, bucket: datetime, start: datetime, end: datetime) -> bool:
+    # A day bucket is only rebuilt when the whole day lies inside the range
+    if granularity == "hour":
+        return start <= bucket < end
+    return start <= bucket and bucket + timedelta(days=1) <= end
+
+# Rebuilds the rollups for [start, end) from db.orders, stopping at the hour the
+# backfill was requested in. Only one backfill holds the lock at a time, and
+# order.rollup jobs skip orders inside its range until it is released.
+@job_handler("rollups.backfill")
+async def handle_rollups_backfill(payload: Dict[str, Any]):
+    start = rollup_bucket(datetime.fromisoformat(payload["start"]), "day")
+    end = min(
+        rollup_bucket(datetime.fromisoformat(payload["end"]), "day") + timedelta(days=1),
+        rollup_bucket(datetime.fromisoformat(payload["cutoff"]), "hour"),
+    )
+    if end <= start:
+        return
+    
+    partial_day = rollup_bucket(end, "day")
+    
+    backfill_id = str(uuid.uuid4())
+    while not await acquire_backfill_lock(backfill_id, start, end):
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+    try:
+        while await db.jobs.count_documents({
+            "type": "order.rollup",
+            "status": "running",
+            "locked_until": {"$gt": datetime.utcnow()},
+        }):
+            await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+            await renew_backfill_lock(backfill_id)
+        
+        await db.sales_rollups.delete_many({
+            "$or": [
+                {"granularity": "hour", "bucket": {"$gte": start, "$lt": end}},
+                {"granularity": "day", "bucket": {"$gte": start, "$lte": end - timedelta(days=1)}},
+            ]
+        })
+        
+        rebuilt = 0
+        last_created_at, last_id = start, ""
+        while True:
+            # Keyset pagination on (created_at, id) keeps each batch an index range scan
+            orders = await db.orders.find({
+                "$or": [
+                    {"created_at": {"$gt": last_created_at, "$lt": end}},
+                    {"created_at": last_created_at, "id": {"$gt": last_id}},
+                ]
+            }).sort([("created_at", 1), ("id", 1)]).limit(ROLLUP_BACKFILL_BATCH_SIZE).to_list(ROLLUP_BACKFILL_BATCH_SIZE)
+            if not orders:
+                break
+            
+            increments = await compute_rollup_increments(orders)
+            await apply_rollup_increments({
+                bucket_key: counters
+                for bucket_key, counters in increments.items()
+                if in_backfill_range(bucket_key[0], bucket_key[1], start, end)
+            })
+            # The partial last day keeps its day buckets, so orders not counted
+            # into them yet are added here the same way order.rollup would
+            pending = []
+            for order in orders:
+                if order["created_at"] >= partial_day and not order.get("rolled_up"):
+                    day_increments = {
+                        bucket_key: counters
+                        for bucket_key, counters in (await compute_rollup_increments([order])).items()
+                        if bucket_key[0] == "day"
+                    }
+                    await apply_order_rollups(order["id"], day_increments)
+                    pending.append((order["id"], day_increments))
+            
+            await db.orders.update_many(
+                {"id": {"$in": [order["id"] for order in orders]}}, {"$set": {"rolled_up": True}}
+            )
+            for order_id, day_increments in pending:
+                await release_order_rollups(order_id, day_increments)
+            rebuilt += len(orders)
+            last_created_at, last_id = orders[-1]["created_at"], orders[-1]["id"]
+            await renew_backfill_lock(backfill_id)
+    finally:
+        await db.rollup_backfills.delete_one({"_id": ROLLUP_BACKFILL_LOCK_ID, "backfill_id": backfill_id})
+    
+    logger.info(f"Rebuilt sales rollups from {rebuilt} orders between {start} and {end}")
+
 @api_router.get("/orders", response_model=List[Order])
 async def get_orders(current_user: User = Depends(get_current_user)):
     query = {"user_id": current_user.id}
@@ -433,6 +1806,24 @@ async def get_order(order_id: str, current_user: User = Depends(get_current_user
     
     return Order(**order)
 
+@api_router.get("/orders/{order_id}/products", response_model=List[Product])
+async def get_order_products(order_id: str, current_user: User = Depends(get_current_user)):
+    query = {"id": order_id}
+    if current_user.role != "admin":
+        query["user_id"] = current_user.id
+    
+    order = await db.orders.find_one(query)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    # Ordered items may since have been sold out and archived
+    product_ids = [item["product_id"] for item in order["items"]]
+    products = await find_products_including_archive(product_ids)
+    await attach_donor_names(products)
+    
+    by_id = {product["id"]: product for product in products}
+    return [Product(**by_id[product_id]) for product_id in product_ids if product_id in by_id]
+
 # Statistics routes (for admin dashboard)
 @api_router.get("/stats/overview")
 async def get_stats_overview(current_user: User = Depends(get_current_user)):
@@ -454,23 +1845,221 @@ async def get_stats_overview(current_user: User = Depends(get_current_user)):
         "total_revenue": total_revenue
     }
 
-# Categories endpoint
-@api_router.get("/categories")
-async def get_categories():
+@api_router.get("/stats/sales")
+async def get_sales_stats(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "day",
+    dimension: str = "total",
+    key: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}")
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}")
+    
+    end = to_naive_utc(end) if end else datetime.utcnow()
+    start = to_naive_utc(start) if start else end - timedelta(days=30)
+    query = {
+        "granularity": granularity,
+        "dimension": dimension,
+        "bucket": {"$gte": rollup_bucket(start, granularity), "$lte": end},
+    }
+    if key:
+        query["key"] = key
+    
+    # Read one extra bucket to tell the caller when the range was cut short
+    rollups = await db.sales_rollups.find(query, {"_id": 0, "granularity": 0, "dimension": 0, "applied_orders": 0}).sort(
+        [("bucket", 1), ("key", 1)]
+    ).to_list(ROLLUP_QUERY_LIMIT + 1)
+    truncated = len(rollups) > ROLLUP_QUERY_LIMIT
+    
     return {
-        "categories": [
-            "Clothing",
-            "Toys", 
-            "Books",
-            "Electronics",
-            "Sports",
-            "Other"
-        ]
+        "granularity": granularity,
+        "dimension": dimension,
+        "start": start,
+        "end": end,
+        "buckets": rollups[:ROLLUP_QUERY_LIMIT],
+        "truncated": truncated,
     }
 
+@api_router.post("/admin/rollups/backfill")
+async def backfill_rollups(
+    start: datetime,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    cutoff = datetime.utcnow()
+    start = to_naive_utc(start)
+    end = to_naive_utc(end) if end else cutoff
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    
+    job_id = await enqueue_job(
+        "rollups.backfill",
+        {"start": start.isoformat(), "end": end.isoformat(), "cutoff": cutoff.isoformat()},
+    )
+    return {"job_id": job_id}
+
+# Admin product lookup, including archived products
+@api_router.get("/admin/products/{product_id}", response_model=Product)
+async def get_admin_product(product_id: str, current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    _, product = await find_product_including_archive(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    await attach_donor_names([product])
+    return Product(**product)
+
+@api_router.post("/admin/archive/sweep")
+async def run_archive_sweep(
+    after_hours: float = ARCHIVE_AFTER_HOURS,
+    current_user: User = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if after_hours < 0:
+        raise HTTPException(status_code=400, detail="after_hours must not be negative")
+    
+    archived = await archive_unavailable_products(after_hours)
+    return {"archived": archived}
+
+# Listing cache metrics (for admin dashboard)
+@api_router.get("/admin/cache")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {"listing_cache": listing_cache.snapshot()}
+
+# Request profiling controls
+@api_router.get("/admin/profiling")
+async def get_profiling(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {"config": profiler.config, "profiles": list(profiler.history)}
+
+@api_router.put("/admin/profiling")
+async def update_profiling(config: ProfilingConfig, current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if config.allow_header and not PROFILE_HEADER_SECRET:
+        raise HTTPException(status_code=400, detail="Set PROFILE_HEADER_SECRET to enable header-triggered profiling")
+    
+    profiler.config = config
+    logger.info(f"Request profiling updated: {config.dict()}")
+    return {"config": profiler.config}
+
+# Job queue metrics (for admin dashboard)
+@api_router.get("/jobs/metrics")
+async def get_job_metrics(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    by_status = await db.jobs.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    
+    return {
+        "queue": {entry["_id"]: entry["count"] for entry in by_status},
+        "process": dict(job_metrics),
+        "workers": len(job_worker_tasks),
+    }
+
+# Batch endpoint: several read-only sub-requests in one round trip
+async def dispatch_subrequest(sub_request: BatchSubRequest, headers: List[tuple]) -> Dict[str, Any]:
+    url = urlsplit(sub_request.path)
+    if url.path.rstrip("/") == "/api/batch":
+        return {"path": sub_request.path, "status": 400, "body": {"detail": "Nested batch requests are not allowed"}}
+    
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": sub_request.method,
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": headers,
+        "client": None,
+        "server": None,
+    }
+    response_status = 500
+    body_parts = []
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+        elif message["type"] == "http.response.body":
+            body_parts.append(message.get("body", b""))
+    
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        # ServerErrorMiddleware re-raises after responding; keep it to this item
+        logger.error(f"Batch sub-request {sub_request.path} failed: {e}")
+        return {"path": sub_request.path, "status": 500, "body": {"detail": "Internal server error"}}
+    
+    raw_body = b"".join(body_parts)
+    try:
+        body = json.loads(raw_body) if raw_body else None
+    except ValueError:
+        body = raw_body.decode(errors="replace")
+    return {"path": sub_request.path, "status": response_status, "body": body}
+
+@api_router.post("/batch")
+async def batch(batch_data: BatchRequest, request: Request):
+    # Sub-requests run with the caller's credentials, never with more
+    headers = [(b"accept", b"application/json")]
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode()))
+    
+    results = await asyncio.gather(
+        *(dispatch_subrequest(sub_request, headers) for sub_request in batch_data.requests)
+    )
+    return {"responses": list(results)}
+
+# Categories endpoint
+categories_payload = PrecompressedPayload.from_content({
+    "categories": [
+        "Clothing",
+        "Toys", 
+        "Books",
+        "Electronics",
+        "Sports",
+        "Other"
+    ]
+}, gzip_level=STATIC_GZIP_LEVEL, brotli_quality=STATIC_BROTLI_QUALITY)
+
+@api_router.get("/categories")
+async def get_categories(request: Request):
+    return categories_payload.response(request)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -500,12 +2089,41 @@ async def startup_event():
         await db.products.create_index("category")
         await db.products.create_index("price")
         await db.orders.create_index("user_id")
+        await db.jobs.create_index([("status", 1), ("run_at", 1)])
+        await db.jobs.create_index("idempotency_key", unique=True, sparse=True)
+        # Finished jobs expire; failed ones stay for inspection
+        await db.jobs.create_index(
+            "completed_at",
+            expireAfterSeconds=JOB_RETENTION_SECONDS,
+            partialFilterExpression={"status": "done"},
+        )
+        await db.search_terms.create_index("term", unique=True)
+        await db.search_terms.create_index(
+            "updated_at", expireAfterSeconds=SEARCH_TERM_RETENTION_DAYS * 24 * 3600
+        )
+        await db.products.create_index([("is_available", 1), ("unavailable_at", 1)])
+        await db.products_archive.create_index("id", unique=True)
+        await db.orders.create_index([("created_at", 1), ("id", 1)])
+        await db.sales_rollups.create_index(
+            [("granularity", 1), ("dimension", 1), ("bucket", 1), ("key", 1)], unique=True
+        )
+        await db.jobs.create_index([("type", 1), ("status", 1)])
         
         logger.info("Database indexes created")
+        
+        await build_suggest_index()
+        logger.info("Suggest index built")
     except Exception as e:
         logger.error(f"Startup error: {e}")
+    
+    start_job_workers(JOB_WORKERS)
+    start_archive_sweeper()
+    start_search_term_flusher()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("Shutting down CharityFinds API...")
+    await stop_job_workers()
+    await stop_archive_sweeper()
+    await stop_search_term_flusher()
     client.close()
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""Standalone job worker.
+
+Runs the background job queue outside the API process:
+
+    JOB_WORKERS=0 uvicorn server:app   # API only enqueues
+    python worker.py                   # workers drain db.jobs
+"""
+import asyncio
+import os
+
+from server import client, logger, run_job_worker
+
+async def main():
+    concurrency = int(os.environ.get("JOB_WORKER_CONCURRENCY", "4"))
+    logger.info(f"Starting {concurrency} standalone job workers")
+    worker_id_prefix = f"{os.uname().nodename}-{os.getpid()}"
+    try:
+        await asyncio.gather(*(run_job_worker(f"{worker_id_prefix}-{i}") for i in range(concurrency)))
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
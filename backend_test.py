@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class CharityFindsAPITester:
@@ -151,6 +152,45 @@ class CharityFindsAPITester:
             return True
         return False
 
+    def test_create_admin_user(self):
+        """Create an admin user for dashboard endpoints"""
+        admin_email = f"admin_{datetime.now().strftime('%H%M%S')}@test.com"
+        user_data = {
+            "name": "Test Admin",
+            "email": admin_email,
+            "password": "TestPass123!",
+            "role": "admin"
+        }
+        
+        success, response = self.run_test(
+            "Admin Registration",
+            "POST",
+            "auth/register",
+            200,
+            data=user_data
+        )
+        
+        if success and 'access_token' in response:
+            self.admin_token = response['access_token']
+            print(f"   Admin token obtained: {self.admin_token[:20]}...")
+            return True
+        return False
+
+    def admin_headers(self):
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.admin_token}'
+        }
+
+    def wait_for(self, check, timeout=15, interval=1):
+        """Poll until background work is visible through the API"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if check():
+                return True
+            time.sleep(interval)
+        return False
+
     def test_create_product(self):
         """Test product creation (requires donor role)"""
         if not hasattr(self, 'donor_token'):
@@ -203,6 +243,43 @@ class CharityFindsAPITester:
             200
         )
 
+    def test_products_batch(self):
+        """Test batch product lookup"""
+        if not self.test_product_id:
+            print("❌ No product ID available for batch product test")
+            return False
+            
+        success, response = self.run_test(
+            "Get Products Batch",
+            "GET",
+            f"products/batch?ids={self.test_product_id},does-not-exist",
+            200
+        )
+        return success and len(response) == 1 and response[0]['id'] == self.test_product_id
+
+    def test_suggest(self):
+        """Test type-ahead suggestions"""
+        success, response = self.run_test("Suggest - Product Title", "GET", "suggest?q=test%20prod", 200)
+        if not success:
+            return False
+        return any(item['text'] == "Test Product for Charity" for item in response.get('suggestions', []))
+
+    def test_batch_requests(self):
+        """Test multiplexed read sub-requests"""
+        batch_data = {
+            "requests": [
+                {"path": "/api/categories"},
+                {"path": "/api/products?category=Toys"},
+                {"path": "/api/products/does-not-exist"}
+            ]
+        }
+        
+        success, response = self.run_test("Batch Requests", "POST", "batch", 200, data=batch_data)
+        if not success:
+            return False
+        statuses = [item['status'] for item in response.get('responses', [])]
+        return statuses == [200, 200, 404]
+
     def test_cart_operations(self):
         """Test cart operations"""
         if not self.token:
@@ -241,6 +318,184 @@ class CharityFindsAPITester:
         
         return success1
 
+    def test_order_background_jobs(self):
+        """Test that post-order side effects run through the job queue"""
+        if not self.test_product_id or not hasattr(self, 'admin_token'):
+            print("❌ No product or admin token available for job queue test")
+            return False
+            
+        cart_item = {"product_id": self.test_product_id, "quantity": 1}
+        success1, _ = self.run_test("Add to Cart for Order", "POST", "cart/add", 200, data=cart_item)
+        
+        order_data = {
+            "items": [{"product_id": self.test_product_id, "quantity": 1}],
+            "shipping_address": {"street": "1 Test Street", "city": "Test City"},
+            "payment_method": "card"
+        }
+        success2, response = self.run_test("Create Order", "POST", "orders", 200, data=order_data)
+        if not (success1 and success2):
+            return False
+        self.test_order_id = response['id']
+        
+        # The order.created job removes the ordered items from the cart
+        def cart_is_empty():
+            _, cart = self.run_test("Get Cart After Order", "GET", "cart", 200)
+            return cart.get('items') == []
+        success3 = self.wait_for(cart_is_empty)
+        
+        success4, metrics = self.run_test(
+            "Job Queue Metrics", "GET", "jobs/metrics", 200, headers=self.admin_headers()
+        )
+        success5, _ = self.run_test("Job Queue Metrics - Non-Admin", "GET", "jobs/metrics", 403)
+        return success3 and success4 and success5 and metrics.get('queue', {}).get('done', 0) > 0
+
+    def test_deleted_product_stays_readable(self):
+        """Test that order history and admin views resolve unavailable/archived products"""
+        if not getattr(self, 'test_order_id', None) or not hasattr(self, 'donor_token'):
+            print("❌ No order or donor token available for archive test")
+            return False
+            
+        donor_headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.donor_token}'
+        }
+        success1, _ = self.run_test(
+            "Delete Product", "DELETE", f"products/{self.test_product_id}", 200, headers=donor_headers
+        )
+        success2, _ = self.run_test(
+            "Get Deleted Product", "GET", f"products/{self.test_product_id}", 404
+        )
+        # after_hours=0 archives immediately, so the lookups below must hit products_archive
+        success3, sweep = self.run_test(
+            "Run Archive Sweep", "POST", "admin/archive/sweep?after_hours=0", 200, headers=self.admin_headers()
+        )
+        success4, products = self.run_test(
+            "Get Order Products", "GET", f"orders/{self.test_order_id}/products", 200
+        )
+        success5, product = self.run_test(
+            "Admin Get Deleted Product",
+            "GET",
+            f"admin/products/{self.test_product_id}",
+            200,
+            headers=self.admin_headers()
+        )
+        return (
+            success1 and success2 and success3 and success4 and success5
+            and sweep.get('archived', 0) >= 1
+            and [item['id'] for item in products] == [self.test_product_id]
+            and product.get('is_available') is False
+        )
+
+    def test_listing_cache_invalidation(self):
+        """Test that product writes are visible through the cached listing"""
+        if not hasattr(self, 'donor_token'):
+            print("❌ No donor token available for cache invalidation test")
+            return False
+            
+        donor_headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.donor_token}'
+        }
+        # Prime the cache for this listing
+        success1, _ = self.run_test("Products - Books (prime cache)", "GET", "products?category=Books&limit=500", 200)
+        
+        product_data = {
+            "title": "Cache Invalidation Test Book",
+            "description": "A book created to check listing cache invalidation.",
+            "price": 4.50,
+            "original_price": 12.00,
+            "category": "Books",
+            "condition": "Good",
+            "image_url": "https://images.unsplash.com/photo-1512820790803-83ca734da794",
+            "location": "Test City",
+            "donor_id": self.donor_id
+        }
+        success2, product = self.run_test(
+            "Create Book", "POST", "products", 200, data=product_data, headers=donor_headers
+        )
+        if not (success1 and success2):
+            return False
+        
+        success3, listing = self.run_test("Products - Books After Create", "GET", "products?category=Books&limit=500", 200)
+        created_visible = any(item['id'] == product['id'] for item in listing)
+        
+        product_data["title"] = "Cache Invalidation Test Book (Updated)"
+        success4, _ = self.run_test(
+            "Update Book", "PUT", f"products/{product['id']}", 200, data=product_data, headers=donor_headers
+        )
+        success5, listing = self.run_test("Products - Books After Update", "GET", "products?category=Books&limit=500", 200)
+        updated_visible = any(item['title'] == product_data["title"] for item in listing)
+        
+        success6, _ = self.run_test(
+            "Delete Book", "DELETE", f"products/{product['id']}", 200, headers=donor_headers
+        )
+        success7, listing = self.run_test("Products - Books After Delete", "GET", "products?category=Books&limit=500", 200)
+        deleted_hidden = all(item['id'] != product['id'] for item in listing)
+        
+        return (
+            success3 and success4 and success5 and success6 and success7
+            and created_visible and updated_visible and deleted_hidden
+        )
+
+    def check_content_encoding(self, name, endpoint, accept_encoding):
+        """Check Content-Encoding negotiation; bodies under 500 bytes stay uncompressed"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+        try:
+            response = requests.get(
+                f"{self.api_url}/{endpoint}",
+                headers={'Accept-Encoding': accept_encoding},
+                timeout=10
+            )
+            # requests has already decoded the body, so this is the uncompressed size
+            expected = accept_encoding if accept_encoding != "identity" and len(response.content) >= 500 else None
+            encoding = response.headers.get('Content-Encoding')
+            if response.status_code == 200 and encoding == expected:
+                self.tests_passed += 1
+                print(f"✅ Passed - Content-Encoding: {encoding}")
+                return True
+            print(f"❌ Failed - Expected Content-Encoding {expected}, got {encoding} (status {response.status_code})")
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+        return False
+
+    def test_response_compression(self):
+        """Test gzip negotiation for catalog payloads"""
+        success1 = self.check_content_encoding("Products - gzip", "products?limit=50", "gzip")
+        success2 = self.check_content_encoding("Products - identity", "products?limit=50", "identity")
+        success3 = self.check_content_encoding("Categories - gzip", "categories", "gzip")
+        return success1 and success2 and success3
+
+    def test_sales_rollups(self):
+        """Test that a new order shows up in the sales rollups"""
+        if not getattr(self, 'test_order_id', None) or not hasattr(self, 'admin_token'):
+            print("❌ No order or admin token available for sales rollup test")
+            return False
+            
+        def order_is_rolled_up():
+            _, stats = self.run_test(
+                "Sales Stats - Hourly Toys",
+                "GET",
+                "stats/sales?granularity=hour&dimension=category&key=Toys",
+                200,
+                headers=self.admin_headers()
+            )
+            return any(bucket['orders'] > 0 for bucket in stats.get('buckets', []))
+        success1 = self.wait_for(order_is_rolled_up)
+        
+        success2, stats = self.run_test(
+            "Sales Stats - Daily Total", "GET", "stats/sales", 200, headers=self.admin_headers()
+        )
+        success3, _ = self.run_test(
+            "Sales Stats - Bad Granularity", "GET", "stats/sales?granularity=week", 400, headers=self.admin_headers()
+        )
+        success4, _ = self.run_test("Sales Stats - Non-Admin", "GET", "stats/sales", 403)
+        return (
+            success1 and success2 and success3 and success4
+            and stats.get('truncated') is False
+            and sum(bucket['revenue'] for bucket in stats.get('buckets', [])) > 0
+        )
+
     def test_products_with_filters(self):
         """Test products endpoint with various filters"""
         # Test with category filter
@@ -281,13 +536,19 @@ def main():
     print("\n👤 DONOR USER CREATION")
     print("-" * 30)
     tester.test_create_donor_user()
+    tester.test_create_admin_user()
     
     # Product tests
     print("\n📦 PRODUCT TESTS")
     print("-" * 30)
     tester.test_create_product()
     tester.test_get_single_product()
+    tester.test_products_batch()
     tester.test_products_with_filters()
+    tester.test_listing_cache_invalidation()
+    tester.test_response_compression()
+    tester.test_batch_requests()
+    tester.test_suggest()
     
     # Cart tests
     print("\n🛒 CART TESTS")
@@ -298,6 +559,13 @@ def main():
     print("\n📋 ORDER TESTS")
     print("-" * 30)
     tester.test_orders()
+    tester.test_order_background_jobs()
+    tester.test_sales_rollups()
+    
+    # Archive tests (deletes the test product, so they run last)
+    print("\n🗄️  ARCHIVE TESTS")
+    print("-" * 30)
+    tester.test_deleted_product_stays_readable()
     
     # Print final results
     print("\n" + "=" * 60)